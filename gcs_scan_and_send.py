@@ -8,44 +8,333 @@ Behavior:
 - For each immediate child folder under the prefix, counts files in
   child/completed/ and child/errorFile/ and writes rows: item,processed,error,total
 - Writes `table.csv` to the current working directory.
-- Optionally invokes `main.py --send` to email the report.
+- Optionally emails the report using `main.ReportSender`.
+- With --multi-send, several --prefix values are scanned in one run, each into
+  its own CSV, and all reports are sent over a single SMTP session.
 
 Authentication:
 - The script uses Application Default Credentials by default. To use a
   service account JSON key, pass --service-account /path/to/key.json.
+- Access tokens are cached in ~/.cache/alerting_mail/gcs_token.json until
+  shortly before expiry; pass --no-token-cache to bypass the cache.
+- The child-folder listing is cached in ~/.cache/alerting_mail/gcs_listing.json
+  for a few minutes and then revalidated with its ETag; pass --no-listing-cache
+  to always refetch. Object listings are never cached.
+
+Networking:
+- HTTPS_PROXY / NO_PROXY are honoured like urllib does; GCS traffic is
+  tunnelled through the proxy with CONNECT.
 
 Usage examples:
   python gcs_scan_and_send.py --bucket my-bucket --prefix sftp/ --send
   python gcs_scan_and_send.py --bucket my-bucket --prefix reports/ --service-account C:\keys\sa.json
+  python gcs_scan_and_send.py --bucket my-bucket --prefix sftp/ --prefix reports/ --multi-send --send
 
 """
 from __future__ import annotations
 
 import argparse
-import csv
+import base64
 import logging
 import subprocess
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, NamedTuple, Optional
 
+import hashlib
+import http.client
 import json
 import os
+import threading
 import time
+import urllib.error
 import urllib.parse
 import urllib.request
 
+try:
+    # optional: orjson parses large listing pages several times faster, straight from bytes
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+
+def _proxy_for(scheme: str, host: str) -> Optional[urllib.parse.SplitResult]:
+    """Return the proxy urllib would use for this scheme/host (HTTPS_PROXY, NO_PROXY, ...), if any."""
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    if "://" not in proxy:
+        proxy = "http://" + proxy
+    return urllib.parse.urlsplit(proxy)
+
+
+def _proxy_auth_headers(proxy: urllib.parse.SplitResult) -> dict:
+    if not proxy.username:
+        return {}
+    creds = f"{urllib.parse.unquote(proxy.username)}:{urllib.parse.unquote(proxy.password or '')}"
+    return {"Proxy-Authorization": "Basic " + base64.b64encode(creds.encode("utf-8")).decode("ascii")}
+
+
+class _ConnectionPool:
+    """A tiny keep-alive pool of HTTPS connections, one pool per host.
+
+    Every GCS call goes to storage.googleapis.com, so reusing connections means
+    the TCP + TLS handshake is paid once per pooled connection instead of once
+    per request. Non-blocking: when the pool is empty a new connection is opened,
+    and connections returned to a full pool are closed.
+
+    Proxies are taken from the environment like urllib.request.urlopen does:
+    HTTPS traffic is tunnelled through the proxy with CONNECT.
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, maxsize: int = 64, retries: int = 3, backoff_factor: float = 0.3):
+        self.maxsize = maxsize
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._idle: Dict[tuple, list] = {}
+        self._proxies: Dict[tuple, Optional[urllib.parse.SplitResult]] = {}
+        self._lock = threading.Lock()
+
+    def resize(self, maxsize: int) -> None:
+        with self._lock:
+            self.maxsize = max(1, maxsize)
+
+    def _proxy(self, key: tuple) -> Optional[urllib.parse.SplitResult]:
+        with self._lock:
+            if key not in self._proxies:
+                self._proxies[key] = _proxy_for(key[0], key[1])
+            return self._proxies[key]
+
+    def _get_conn(self, key: tuple, timeout: int) -> http.client.HTTPConnection:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                # http.client only applies .timeout when connecting; update the live socket too
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        proxy = self._proxy(key)
+        if proxy is None:
+            return cls(host, port, timeout=timeout)
+        proxy_port = proxy.port or (443 if proxy.scheme == "https" else 80)
+        if scheme != "https":
+            # plain HTTP is sent to the proxy with an absolute request URI
+            return http.client.HTTPConnection(proxy.hostname, proxy_port, timeout=timeout)
+        conn = cls(proxy.hostname, proxy_port, timeout=timeout)
+        conn.set_tunnel(host, port, headers=_proxy_auth_headers(proxy))
+        return conn
+
+    def _put_conn(self, key: tuple, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.maxsize:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method: str, url: str, headers: dict | None = None, timeout: int = 20) -> tuple[int, http.client.HTTPMessage, bytes]:
+        """Issue a request and return (status, headers, body), retrying transient failures."""
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        hdrs = {"Connection": "keep-alive", **(headers or {})}
+        proxy = self._proxy(key)
+        if proxy is not None and parts.scheme != "https":
+            path = url
+            hdrs.update(_proxy_auth_headers(proxy))
+
+        for attempt in range(self.retries + 1):
+            conn = self._get_conn(key, timeout)
+            try:
+                conn.request(method, path, headers=hdrs)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (OSError, http.client.HTTPException):
+                # stale keep-alive connections surface here as resets/RemoteDisconnected
+                conn.close()
+                if attempt >= self.retries:
+                    raise
+            else:
+                if resp.will_close:
+                    conn.close()
+                else:
+                    self._put_conn(key, conn)
+                if resp.status not in self.RETRY_STATUSES or attempt >= self.retries:
+                    return resp.status, resp.msg, data
+            time.sleep(self.backoff_factor * (2 ** attempt))
+        raise AssertionError("unreachable")
+
+
+_POOL = _ConnectionPool(maxsize=64)
+
+
+def _write_private_json(path: Path, obj) -> None:
+    """Atomically replace `path` with `obj` as JSON, readable only by the current user.
+
+    The data goes to a 0600 temp file in the same directory, which is then os.replace()d
+    over `path`, so overlapping runs never see or leave behind a half-written file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(obj, fh)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+LISTING_CACHE_PATH = Path.home() / ".cache" / "alerting_mail" / "gcs_listing.json"
+# seconds a cached listing page is served without asking GCS, per kind of listing. Only the
+# child-prefix listing is cached: it is small and stable, while object pages carry every
+# object name and their pageToken URLs churn as objects come and go.
+LISTING_CACHE_TTLS = {"prefixes": 600}
+# expired entries are kept for revalidation (If-None-Match) for at most this long
+LISTING_CACHE_RETENTION = 3600
+
+
+class _ListingCache:
+    """On-disk cache of GCS listing pages keyed by URL hash: {key: [etag, body, expires_at]}.
+
+    Fresh entries are returned without a request; expired ones are revalidated with
+    If-None-Match so an unchanged page comes back as a body-less 304.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.enabled = True
+        self._entries: Optional[Dict[str, list]] = None
+        self._touched: set = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
 
-def _http_get(url: str, headers: dict | None = None, timeout: int = 20) -> dict:
-    req = urllib.request.Request(url, headers=headers or {})
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        data = resp.read()
-        if not data:
+    def _read_file(self) -> Dict[str, list]:
+        try:
+            entries = _json_loads(self.path.read_bytes())
+        except (OSError, ValueError):
             return {}
-        return json.loads(data.decode("utf-8"))
+        return entries if isinstance(entries, dict) else {}
+
+    def _load(self) -> Dict[str, list]:
+        if self._entries is None:
+            self._entries = self._read_file()
+        return self._entries
+
+    def get(self, key: str) -> Optional[list]:
+        with self._lock:
+            return self._load().get(key)
+
+    def put(self, key: str, etag: Optional[str], body: dict, ttl: float) -> None:
+        with self._lock:
+            self._load()[key] = [etag, body, time.time() + ttl]
+            self._touched.add(key)
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._touched or self._entries is None:
+                return
+            # merge onto what is on disk now so a concurrent run's entries are kept
+            entries = self._read_file()
+            entries.update({k: self._entries[k] for k in self._touched})
+            cutoff = time.time() - LISTING_CACHE_RETENTION
+            entries = {k: v for k, v in entries.items() if isinstance(v, list) and len(v) == 3 and v[2] >= cutoff}
+            try:
+                # listings reveal folder names: keep the cache private to the user
+                _write_private_json(self.path, entries)
+            except OSError as exc:
+                logging.debug("Could not write listing cache %s: %s", self.path, exc)
+                return
+            self._entries = entries
+            self._touched.clear()
+
+
+_LISTING_CACHE = _ListingCache(LISTING_CACHE_PATH)
+
+
+def _http_get(url: str, headers: dict | None = None, timeout: int = 20, cache_kind: Optional[str] = None, pool: Optional[_ConnectionPool] = None) -> dict:
+    """GET a JSON document; with `cache_kind` set, go through the listing cache."""
+    entry = key = None
+    if cache_kind and _LISTING_CACHE.enabled:
+        key = _LISTING_CACHE.key(url)
+        entry = _LISTING_CACHE.get(key)
+        if entry:
+            etag, body, expires_at = entry
+            if time.time() < expires_at:
+                return body
+            if etag:
+                headers = {**(headers or {}), "If-None-Match": etag}
+
+    status, resp_headers, data = (pool or _POOL).request("GET", url, headers=headers, timeout=timeout)
+    if status == 304 and entry:
+        _LISTING_CACHE.put(key, entry[0], entry[1], LISTING_CACHE_TTLS[cache_kind])
+        return entry[1]
+    if status >= 400:
+        raise urllib.error.HTTPError(url, status, data[:200].decode("utf-8", "replace"), resp_headers, None)
+    body = _json_loads(data) if data else {}
+    if key:
+        _LISTING_CACHE.put(key, resp_headers.get("ETag"), body, LISTING_CACHE_TTLS[cache_kind])
+    return body
+
+
+TOKEN_CACHE_PATH = Path.home() / ".cache" / "alerting_mail" / "gcs_token.json"
+# refresh cached tokens this many seconds before their recorded expiry
+TOKEN_CACHE_BUFFER = 90
+# `gcloud auth print-access-token` does not report a lifetime; its tokens live for an hour
+GCLOUD_TOKEN_LIFETIME = 3600
+
+
+def _read_cached_token(path: Path = TOKEN_CACHE_PATH) -> Optional[dict]:
+    try:
+        with path.open("r", encoding="utf-8") as fh:
+            entry = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or not entry.get("token"):
+        return None
+    if time.time() >= float(entry.get("exp", 0)) - TOKEN_CACHE_BUFFER:
+        return None
+    return entry
+
+
+def _write_cached_token(token: str, expires_in: float, source: str, path: Path = TOKEN_CACHE_PATH) -> None:
+    entry = {"token": token, "exp": time.time() + expires_in - 60, "source": source}
+    try:
+        # 0600 so the bearer token is never world-readable, even briefly
+        _write_private_json(path, entry)
+    except OSError as exc:
+        logging.debug("Could not write token cache %s: %s", path, exc)
+
+
+def _invalidate_cached_token(path: Path = TOKEN_CACHE_PATH) -> bool:
+    """Delete the token cache; returns True if there was one to delete."""
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        return False
+    except OSError as exc:
+        logging.debug("Could not remove token cache %s: %s", path, exc)
+        return False
+    return True
 
 
-def get_access_token() -> str:
+def get_access_token(use_cache: bool = True) -> str:
     """Get an OAuth2 access token for GCS.
 
     Order:
@@ -54,8 +343,18 @@ def get_access_token() -> str:
       2. Use environment variable GCS_ACCESS_TOKEN
       3. Try `gcloud auth print-access-token` (if gcloud is available)
 
+    Tokens from (1) and (3) are cached in TOKEN_CACHE_PATH until shortly before they
+    expire, so frequent cron runs skip the metadata round-trip or gcloud subprocess.
+    Pass use_cache=False to always fetch a fresh token.
+
     This avoids third-party Python libraries; the token is used in Bearer header.
     """
+    if use_cache:
+        cached = _read_cached_token()
+        # a cached gcloud token must not shadow an explicitly configured GCS_ACCESS_TOKEN
+        if cached and not (cached.get("source") == "gcloud" and os.environ.get("GCS_ACCESS_TOKEN")):
+            return cached["token"]
+
     # 1) metadata server
     metadata_url = "http://metadata/computeMetadata/v1/instance/service-accounts/default/token"
     try:
@@ -65,6 +364,8 @@ def get_access_token() -> str:
             token_json = json.loads(data.decode("utf-8"))
             token = token_json.get("access_token")
             if token:
+                if use_cache:
+                    _write_cached_token(token, float(token_json.get("expires_in", 0)), "metadata")
                 return token
     except Exception:
         pass
@@ -79,6 +380,8 @@ def get_access_token() -> str:
         out = subprocess.check_output(["gcloud", "auth", "print-access-token"], stderr=subprocess.DEVNULL, text=True, timeout=5)
         tok = out.strip()
         if tok:
+            if use_cache:
+                _write_cached_token(tok, GCLOUD_TOKEN_LIFETIME, "gcloud")
             return tok
     except Exception:
         pass
@@ -86,19 +389,47 @@ def get_access_token() -> str:
     raise RuntimeError("No GCS access token available. Set GCS_ACCESS_TOKEN, run on GCP, or install and auth gcloud.")
 
 
-def _list_prefixes(bucket_name: str, prefix: str, token: str) -> list[str]:
-    """Return a list of immediate child prefixes under the given prefix using delimiter='/'"""
-    prefixes: list[str] = []
-    base = f"https://storage.googleapis.com/storage/v1/b/{urllib.parse.quote(bucket_name)}/o"
-    params = {"prefix": prefix, "delimiter": "/", "fields": "prefixes,nextPageToken"}
+# immutable query-string parts of each kind of listing, encoded once
+_PREFIXES_QUERY = urllib.parse.urlencode({"delimiter": "/", "fields": "prefixes,nextPageToken", "maxResults": "1000"})
+# object pages use the API maximum of 1000 results and project only the name, keeping
+# both the number of round-trips and the payload small
+_OBJECTS_QUERY = urllib.parse.urlencode({"fields": "items(name),nextPageToken", "maxResults": "1000"})
+
+
+class _BucketContext(NamedTuple):
+    """Per-scan request state, built once in scan_bucket and shared by every listing."""
+
+    base_url: str
+    headers: dict
+    pool: _ConnectionPool
+
+    @classmethod
+    def create(cls, bucket_name: str, token: str, pool: _ConnectionPool = _POOL) -> "_BucketContext":
+        base_url = f"https://storage.googleapis.com/storage/v1/b/{urllib.parse.quote(bucket_name)}/o"
+        return cls(base_url, {"Authorization": f"Bearer {token}"}, pool)
+
+
+def _iter_list_pages(ctx: _BucketContext, prefix: str, query: str, cache_kind: Optional[str] = None):
+    """Yield each parsed page of an objects.list call, following nextPageToken.
+
+    `query` is one of the pre-encoded _*_QUERY strings; only the prefix and the page
+    token are encoded here.
+    """
+    url = f"{ctx.base_url}?{query}&prefix={urllib.parse.quote(prefix, safe='')}"
     page_token = None
-    headers = {"Authorization": f"Bearer {token}"}
     while True:
-        if page_token:
-            params["pageToken"] = page_token
-        qs = urllib.parse.urlencode(params)
-        url = base + "?" + qs
-        resp = _http_get(url, headers=headers)
+        page_url = f"{url}&pageToken={urllib.parse.quote(page_token, safe='')}" if page_token else url
+        resp = _http_get(page_url, headers=ctx.headers, cache_kind=cache_kind, pool=ctx.pool)
+        yield resp
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            break
+
+
+def _list_prefixes(ctx: _BucketContext, prefix: str) -> list[str]:
+    """Return a list of immediate child prefixes under the given prefix using delimiter='/'"""
+    prefixes: list[str] = []
+    for resp in _iter_list_pages(ctx, prefix, _PREFIXES_QUERY, cache_kind="prefixes"):
         pfxs = resp.get("prefixes") or []
         for p in pfxs:
             # p will be like 'sftp/foo/'
@@ -106,139 +437,198 @@ def _list_prefixes(bucket_name: str, prefix: str, token: str) -> list[str]:
             child = rest.rstrip("/").split("/")[0]
             if child:
                 prefixes.append(child)
-        page_token = resp.get("nextPageToken")
-        if not page_token:
-            break
     return prefixes
 
 
-def _count_objects(bucket_name: str, prefix: str, token: str) -> int:
-    """Count objects under the prefix using list API and pagination."""
-    base = f"https://storage.googleapis.com/storage/v1/b/{urllib.parse.quote(bucket_name)}/o"
-    params = {"prefix": prefix, "fields": "items/name,nextPageToken"}
-    page_token = None
-    headers = {"Authorization": f"Bearer {token}"}
-    total = 0
-    while True:
-        if page_token:
-            params["pageToken"] = page_token
-        qs = urllib.parse.urlencode(params)
-        url = base + "?" + qs
-        resp = _http_get(url, headers=headers)
-        items = resp.get("items") or []
-        total += len(items)
-        page_token = resp.get("nextPageToken")
-        if not page_token:
-            break
-    return total
+def _tally_objects(ctx: _BucketContext, prefix: str, child: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    """List every object under `prefix` (or only under `prefix/child/`) once and tally
+    completed/ and errorFile/ names per child.
+
+    Pages come back 1000 names at a time with no other object metadata (see _OBJECTS_QUERY).
+    """
+    counts: Dict[str, Dict[str, int]] = {}
+    for resp in _iter_list_pages(ctx, f"{prefix}{child}/" if child else prefix, _OBJECTS_QUERY):
+        for item in resp.get("items", []):
+            name = item.get("name", "")
+            rest = name[len(prefix) :] if prefix and name.startswith(prefix) else name
+            parts = rest.split("/")
+            # objects directly under the prefix are not child folders
+            if len(parts) < 2 or not parts[0]:
+                continue
+            v = counts.setdefault(parts[0], {"processed": 0, "error": 0, "total": 0})
+            if parts[1] == "completed":
+                v["processed"] += 1
+            elif parts[1] == "errorFile":
+                v["error"] += 1
+    return counts
+
+
+def _scan_children(ctx: _BucketContext, prefix: str, children: list[str], concurrency: int) -> list[Dict[str, Dict[str, int]]]:
+    """Walk every child subtree concurrently on up to `concurrency` worker threads."""
+    if not children:
+        return []
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(children))) as executor:
+        return list(executor.map(lambda child: _tally_objects(ctx, prefix, child), children))
 
 
-def scan_bucket(bucket_name: str, prefix: str, service_account: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+def _normalize_prefix(prefix: str) -> str:
+    """Scan prefixes always name a folder: 'sftp' and 'sftp/' are the same prefix."""
+    if prefix and not prefix.endswith("/"):
+        prefix = prefix + "/"
+    return prefix
+
+
+def scan_bucket(bucket_name: str, prefix: str, service_account: Optional[str] = None, use_token_cache: bool = True, use_listing_cache: bool = True, concurrency: int = 64, fallback_walk: bool = False) -> Dict[str, Dict[str, int]]:
     """Return mapping child -> counts, using raw HTTP calls to GCS JSON API.
 
     `service_account` is ignored for this minimal implementation; use GCS_ACCESS_TOKEN or run on GCP.
+    Children are found with one delimiter listing; each child's subtree is then listed
+    exactly once and tallied, with up to `concurrency` child walks overlapping.
+    The child-prefix listing is cached on disk for a few minutes and revalidated by ETag
+    afterwards (see LISTING_CACHE_TTLS); pass use_listing_cache=False to always refetch.
+
+    If the delimiter listing fails the error is raised, unless `fallback_walk` is set:
+    then the whole prefix is listed in one sequential walk instead, which can be very
+    slow on large buckets.
+
+    If GCS answers 401 while a cached token exists, the cache is dropped and the scan
+    is retried once with a freshly fetched token.
     """
-    token = get_access_token()
-    # normalize prefix
-    if prefix and not prefix.endswith("/"):
-        prefix = prefix + "/"
+    token = get_access_token(use_cache=use_token_cache)
+    _LISTING_CACHE.enabled = use_listing_cache
+    concurrency = max(1, concurrency)
+    # one pooled connection per in-flight walk avoids connection churn
+    _POOL.resize(concurrency)
+    prefix = _normalize_prefix(prefix)
 
-    counts: Dict[str, Dict[str, int]] = {}
+    try:
+        counts = _scan(_BucketContext.create(bucket_name, token), prefix, concurrency, fallback_walk)
+    except urllib.error.HTTPError as exc:
+        # a revoked token or a switched gcloud account would otherwise fail every run until it expires
+        if exc.code != 401 or not use_token_cache or not _invalidate_cached_token():
+            raise
+        logging.warning("GCS rejected the cached access token; retrying with a fresh one")
+        token = get_access_token(use_cache=True)
+        counts = _scan(_BucketContext.create(bucket_name, token), prefix, concurrency, fallback_walk)
+    _LISTING_CACHE.save()
 
-    # collect children via prefixes
+    return counts
+
+
+def _scan(ctx: _BucketContext, prefix: str, concurrency: int, fallback_walk: bool) -> Dict[str, Dict[str, int]]:
+    counts: Dict[str, Dict[str, int]] = {}
     try:
-        seen_children = set(_list_prefixes(bucket_name, prefix, token))
-    except Exception:
-        # fallback to scanning object names (smaller buckets)
-        seen_children = set()
-        # reuse _count_objects with listing without delimiter: get all object names and parse
-        base = f"https://storage.googleapis.com/storage/v1/b/{urllib.parse.quote(bucket_name)}/o"
-        params = {"prefix": prefix, "fields": "items/name,nextPageToken"}
-        page_token = None
-        headers = {"Authorization": f"Bearer {token}"}
-        while True:
-            if page_token:
-                params["pageToken"] = page_token
-            qs = urllib.parse.urlencode(params)
-            url = base + "?" + qs
-            resp = _http_get(url, headers=headers)
-            for item in resp.get("items", []):
-                name = item.get("name", "")
-                rest = name[len(prefix) :] if prefix and name.startswith(prefix) else name
-                parts = rest.split("/")
-                if parts and parts[0]:
-                    seen_children.add(parts[0])
-            page_token = resp.get("nextPageToken")
-            if not page_token:
-                break
-
-    for child in sorted(seen_children):
-        processed_prefix = f"{prefix}{child}/completed/" if prefix else f"{child}/completed/"
-        error_prefix = f"{prefix}{child}/errorFile/" if prefix else f"{child}/errorFile/"
-
-        processed_count = _count_objects(bucket_name, processed_prefix, token)
-        error_count = _count_objects(bucket_name, error_prefix, token)
-        total_count = processed_count + error_count
-        counts[child] = {"processed": processed_count, "error": error_count, "total": total_count}
+        children = sorted(set(_list_prefixes(ctx, prefix)))
+    except Exception as exc:
+        if not fallback_walk:
+            raise
+        logging.warning("Listing child prefixes failed (%s); walking every object under %r", exc, prefix)
+        counts = dict(sorted(_tally_objects(ctx, prefix).items()))
+    else:
+        for child in children:
+            counts[child] = {"processed": 0, "error": 0, "total": 0}
+        for partial in _scan_children(ctx, prefix, children, concurrency):
+            for child, v in partial.items():
+                counts[child]["processed"] += v["processed"]
+                counts[child]["error"] += v["error"]
+
+    for v in counts.values():
+        v["total"] = v["processed"] + v["error"]
 
     return counts
 
 
+def _csv_field(value: str) -> str:
+    # GCS folder names may contain separators or quotes; quote them the way csv.writer would
+    if any(c in value for c in ',"\r\n'):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
 def write_csv(path: Path, counts: Dict[str, Dict[str, int]]):
-    with path.open("w", newline="", encoding="utf-8") as fh:
-        writer = csv.writer(fh)
-        writer.writerow(["item", "processed", "error", "total"])
-        for item, v in counts.items():
-            writer.writerow([item, v.get("processed", 0), v.get("error", 0), v.get("total", 0)])
+    """Write the report in one buffered write instead of one writerow call per row."""
+    lines = ["item,processed,error,total\n"]
+    lines += [f"{_csv_field(item)},{v.get('processed', 0)},{v.get('error', 0)},{v.get('total', 0)}\n" for item, v in counts.items()]
+    with open(path, "wb", buffering=1 << 20) as fh:
+        fh.write("".join(lines).encode("utf-8"))
+
+
+def _report_slug(prefix: str) -> str:
+    return prefix.strip("/").replace("/", "_") or "root"
+
+
+def _report_path(out: str, prefix: str, multi: bool) -> Path:
+    """Output path for one prefix's report; with several reports each gets its own file."""
+    path = Path.cwd() / out
+    if not multi:
+        return path
+    return path.with_name(f"{path.stem}-{_report_slug(prefix)}{path.suffix}")
 
 
 def main(argv: list[str] | None = None):
     p = argparse.ArgumentParser(description="Scan GCS bucket and create table.csv report")
     p.add_argument("--bucket", required=True, help="GCS bucket name (e.g. my-bucket)")
-    p.add_argument("--prefix", default="sftp/", help="Prefix inside the bucket to scan (default: sftp/)")
+    p.add_argument("--prefix", action="append", help="Prefix inside the bucket to scan (default: sftp/); repeat with --multi-send")
     p.add_argument("--service-account", help="Path to service account JSON key (optional)")
     p.add_argument("--out", default="table.csv", help="Output CSV path (default: table.csv)")
+    p.add_argument("--concurrency", type=int, default=64, help="Number of child folders listed in parallel (default: 64)")
+    p.add_argument("--fallback-walk", action="store_true", help="If listing child folders fails, list every object under the prefix instead (slow on large buckets)")
+    p.add_argument("--no-token-cache", action="store_true", help="Always fetch a fresh access token instead of using the on-disk cache")
+    p.add_argument("--no-listing-cache", action="store_true", help="Always refetch the child-folder listing instead of using the on-disk ETag cache")
     p.add_argument("--send", action="store_true", help="If set, send email after writing CSV")
+    p.add_argument("--multi-send", action="store_true", help="Scan every --prefix into its own CSV (table-<prefix>.csv) and, with --send, deliver one email per report over a single SMTP session")
     p.add_argument("--subject", help="Email subject to use when sending")
     p.add_argument("--body", help="Email body to use when sending")
     args = p.parse_args(argv)
 
+    # 'sftp' and 'sftp/' scan the same folder: report it once
+    prefixes = list(dict.fromkeys(_normalize_prefix(pfx) for pfx in args.prefix or ["sftp/"]))
+    if len(prefixes) > 1 and not args.multi_send:
+        p.error("--prefix may only be given once without --multi-send")
+    # distinct prefixes such as 'a/b' and 'a_b' would otherwise overwrite each other's CSV
+    seen_slugs: Dict[str, str] = {}
+    for pfx in prefixes:
+        other = seen_slugs.setdefault(_report_slug(pfx), pfx)
+        if other != pfx:
+            p.error(f"--prefix {other!r} and {pfx!r} would both write {_report_path(args.out, pfx, True).name}")
+
     logging.basicConfig(level=logging.INFO)
 
-    logging.info("Scanning bucket: %s prefix: %s", args.bucket, args.prefix)
-    try:
-        counts = scan_bucket(args.bucket, args.prefix, args.service_account)
-    except Exception as e:
-        logging.error("Failed to scan bucket: %s", e)
-        sys.exit(2)
+    reports: list[tuple[str, Path]] = []
+    for prefix in prefixes:
+        logging.info("Scanning bucket: %s prefix: %s", args.bucket, prefix)
+        try:
+            counts = scan_bucket(args.bucket, prefix, args.service_account, use_token_cache=not args.no_token_cache, use_listing_cache=not args.no_listing_cache, concurrency=args.concurrency, fallback_walk=args.fallback_walk)
+        except Exception as e:
+            logging.error("Failed to scan bucket: %s", e)
+            sys.exit(2)
 
-    out_path = Path.cwd() / args.out
-    write_csv(out_path, counts)
-    logging.info("Wrote report to %s (%d rows)", out_path, len(counts))
+        out_path = _report_path(args.out, prefix, args.multi_send)
+        write_csv(out_path, counts)
+        logging.info("Wrote report to %s (%d rows)", out_path, len(counts))
+        reports.append((prefix, out_path))
 
     if args.send:
-        # Try to call main.send_email_from_env directly for a cleaner, secure flow
         try:
-            from main import send_email_from_env
-
-            subject = args.subject or "Automated GCS report"
-            body = args.body or "Please find the automated report generated from GCS."
-            send_email_from_env(subject, body, out_path)
-            logging.info("Email sent via main.send_email_from_env")
+            from main import ReportSender, load_dotenv
+        except ImportError as exc:
+            logging.error("Cannot import main.py to send the email (%s). Please ensure main.py is in the same folder.", exc)
+            sys.exit(3)
+
+        # main.py's own CLI loads .env before sending; do the same for in-process sends
+        load_dotenv()
+        subject = args.subject or "Automated GCS report"
+        body = args.body or "Please find the automated report generated from GCS."
+        try:
+            # queue every report first so they all go out over one SMTP login
+            sender = ReportSender.from_env()
+            for prefix, out_path in reports:
+                sender.add_report(f"{subject} ({prefix})" if args.multi_send else subject, body, out_path)
+            sent = sender.flush()
         except Exception as exc:
-            logging.warning("Direct call to main.send_email_from_env failed: %s", exc)
-            # Fallback to subprocess invocation (keeps original behavior)
-            main_py = Path(__file__).parent / "main.py"
-            if not main_py.exists():
-                logging.error("Cannot find main.py to send the email. Please ensure main.py is in the same folder.")
-                sys.exit(3)
-            cmd = [sys.executable, str(main_py), "--send"]
-            if args.subject:
-                cmd += ["--subject", args.subject]
-            if args.body:
-                cmd += ["--body", args.body]
-            logging.info("Invoking email sender subprocess: %s", " ".join(cmd))
-            subprocess.run(cmd, check=False)
+            logging.error("Failed to send email: %s", exc)
+            sys.exit(4)
+        logging.info("Sent %d email(s) via main.ReportSender", sent)
 
 
 if __name__ == "__main__":
@@ -1,32 +1,45 @@
 import argparse
 import csv
-import getpass
+import html
 import logging
 import os
+import re
 import smtplib
-import sys
 import time
 from email.message import EmailMessage
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
 
+# one anchored pattern over the whole file; comments, blank and malformed lines never match
+_DOTENV_RE = re.compile(rb"""^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(?:"([^"\r\n]*)"|'([^'\r\n]*)'|([^\r\n]*))""", re.MULTILINE)
+
+
+@lru_cache(maxsize=8)
+def _parse_env(path_and_mtime: tuple[str, float]) -> dict[str, str]:
+    """Parse a .env file into a dict; cached per (path, mtime) so repeated loads are free."""
+    path, _mtime = path_and_mtime
+    with open(path, "rb") as fh:
+        data = fh.read()
+    values: dict[str, str] = {}
+    for k, dq, sq, raw in _DOTENV_RE.findall(data):
+        # first occurrence wins, as with os.environ.setdefault
+        values.setdefault(k.decode(), (dq or sq or raw.strip()).decode("utf-8"))
+    return values
+
+
 def load_dotenv(path: str = ".env") -> None:
     """Load a simple KEY=VALUE .env file into os.environ without overwriting existing values."""
-    p = Path(path)
-    if not p.exists():
-        return
     try:
-        with p.open("r", encoding="utf-8") as fh:
-            for line in fh:
-                line = line.strip()
-                if not line or line.startswith("#") or "=" not in line:
-                    continue
-                k, v = line.split("=", 1)
-                os.environ.setdefault(k.strip(), v.strip().strip('"').strip("'"))
+        values = _parse_env((os.path.abspath(path), os.path.getmtime(path)))
+    except FileNotFoundError:
+        return
     except Exception:
         # Do not raise; silently ignore malformed .env in production usage
         return
+    for k, v in values.items():
+        os.environ.setdefault(k, v)
 
 
 def build_message(sender: str, receiver: str, subject: str, body: str, table_path: Optional[Path] = None) -> EmailMessage:
@@ -48,20 +61,17 @@ def build_message(sender: str, receiver: str, subject: str, body: str, table_pat
             rows = []
 
         if rows:
-            cols = rows[0]
-            html = ["<html><body>", f"<p>{body}</p>", '<table border="1" cellpadding="6" cellspacing="0" style="border-collapse:collapse">']
-            html.append("<thead><tr>")
-            for c in cols:
-                html.append(f"<th style=\"background:#eee\">{c}</th>")
-            html.append("</tr></thead>")
-            html.append("<tbody>")
-            for row in rows[1:]:
-                html.append("<tr>")
-                for cell in row:
-                    html.append(f"<td>{cell}</td>")
-                html.append("</tr>")
-            html.append("</tbody></table></body></html>")
-            html_body = "\n".join(html)
+            # pad ragged rows so one precomputed row template fits every row
+            width = max(len(r) for r in rows)
+            cols = [html.escape(c) for c in rows[0]] + [""] * (width - len(rows[0]))
+            row_fmt = "<tr>" + "<td>{}</td>" * width + "</tr>"
+            body_rows = "\n".join(row_fmt.format(*map(html.escape, r), *[""] * (width - len(r))) for r in rows[1:])
+            head = "".join(f'<th style="background:#eee">{c}</th>' for c in cols)
+            html_body = (
+                f"<html><body>\n<p>{html.escape(body)}</p>\n"
+                '<table border="1" cellpadding="6" cellspacing="0" style="border-collapse:collapse">\n'
+                f"<thead><tr>{head}</tr></thead>\n<tbody>\n{body_rows}\n</tbody></table></body></html>"
+            )
             msg.set_content(plain_body)
             msg.add_alternative(html_body, subtype="html")
             return msg
@@ -70,17 +80,91 @@ def build_message(sender: str, receiver: str, subject: str, body: str, table_pat
     return msg
 
 
-def send_email_from_env(subject: str, body: str, table_path: Optional[Path] = None, *, smtp_host: str = "smtp.gmail.com", smtp_port: int = 587, timeout: int = 20, max_retries: int = 3) -> None:
-    """Send an email using credentials from environment variables.
+class SMTPSender:
+    """An SMTP session that is opened, upgraded to TLS and authenticated once.
 
-    Required environment variables:
-      - SENDER_EMAIL
-      - RECEIVER_EMAIL
-      - SMTP_PASSWORD (an App Password for Gmail when using Gmail)
-
-    This function performs a small retry loop for transient failures and
-    logs errors instead of printing sensitive information.
+    The connection is opened lazily on the first send and kept for later sends, so
+    N emails cost one TCP + TLS + AUTH handshake instead of N. Only the send itself
+    is retried; after a failure the connection is probed with NOOP and re-established
+    only if it is actually broken. Use as a context manager to close the session.
     """
+
+    def __init__(self, sender: str, password: str, *, smtp_host: str = "smtp.gmail.com", smtp_port: int = 587, timeout: int = 20, max_retries: int = 3):
+        self.sender = sender
+        self.password = password
+        self.smtp_host = smtp_host
+        self.smtp_port = smtp_port
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._smtp: Optional[smtplib.SMTP] = None
+
+    def __enter__(self) -> "SMTPSender":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def open(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            s = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=self.timeout)
+            try:
+                s.starttls()
+                s.login(self.sender, self.password)
+            except Exception:
+                s.close()
+                raise
+            self._smtp = s
+        return self._smtp
+
+    def close(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
+
+    def _connection_alive(self) -> bool:
+        if self._smtp is None:
+            return False
+        try:
+            return self._smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _drop_if_broken(self) -> None:
+        if self._smtp is not None and not self._connection_alive():
+            try:
+                self._smtp.close()
+            finally:
+                self._smtp = None
+
+    def send(self, msg: EmailMessage) -> None:
+        """Send `msg` over the persistent session with a small retry loop."""
+        last_exc = None
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self.open().send_message(msg)
+                logging.info("Email sent to %s", msg["To"])
+                return
+            except smtplib.SMTPException as exc:
+                last_exc = exc
+                logging.warning("SMTP attempt %d failed: %s", attempt, exc)
+                self._drop_if_broken()
+                # simple backoff
+                time.sleep(2 ** attempt)
+            except Exception as exc:
+                last_exc = exc
+                logging.exception("Unexpected error while sending email: %s", exc)
+                self._drop_if_broken()
+                time.sleep(1)
+
+        # If we get here, all retries failed
+        raise RuntimeError("Failed to send email after retries") from last_exc
+
+
+def _credentials_from_env() -> tuple[str, str, str]:
     sender = os.environ.get("SENDER_EMAIL")
     receiver = os.environ.get("RECEIVER_EMAIL")
     password = os.environ.get("SMTP_PASSWORD") or os.environ.get("APP_PASSWORD")
@@ -90,30 +174,77 @@ def send_email_from_env(subject: str, body: str, table_path: Optional[Path] = No
     if not password:
         # For non-interactive/automated runs we require password in env (use Secret Manager in prod)
         raise RuntimeError("SMTP_PASSWORD (App Password) must be set in environment for automated sending")
+    return sender, receiver, password
+
+
+def send_email_from_env(subject: str, body: str, table_path: Optional[Path] = None, *, smtp_host: str = "smtp.gmail.com", smtp_port: int = 587, timeout: int = 20, max_retries: int = 3, session: Optional[SMTPSender] = None) -> None:
+    """Send an email using credentials from environment variables.
+
+    Required environment variables:
+      - SENDER_EMAIL
+      - RECEIVER_EMAIL
+      - SMTP_PASSWORD (an App Password for Gmail when using Gmail)
+
+    This function performs a small retry loop for transient failures and
+    logs errors instead of printing sensitive information.
+
+    Pass an already open `session` to send several emails over one SMTP
+    connection; otherwise a session is opened and closed for this email.
+    """
+    sender, receiver, password = _credentials_from_env()
 
     msg = build_message(sender, receiver, subject, body, table_path)
 
-    last_exc = None
-    for attempt in range(1, max_retries + 1):
-        try:
-            with smtplib.SMTP(smtp_host, smtp_port, timeout=timeout) as s:
-                s.starttls()
-                s.login(sender, password)
-                s.send_message(msg)
-            logging.info("Email sent to %s", receiver)
-            return
-        except smtplib.SMTPException as exc:
-            last_exc = exc
-            logging.warning("SMTP attempt %d failed: %s", attempt, exc)
-            # simple backoff
-            time.sleep(2 ** attempt)
-        except Exception as exc:
-            last_exc = exc
-            logging.exception("Unexpected error while sending email: %s", exc)
-            time.sleep(1)
-
-    # If we get here, all retries failed
-    raise RuntimeError("Failed to send email after retries") from last_exc
+    if session is not None:
+        session.send(msg)
+        return
+    with SMTPSender(sender, password, smtp_host=smtp_host, smtp_port=smtp_port, timeout=timeout, max_retries=max_retries) as s:
+        s.send(msg)
+
+
+class ReportSender:
+    """Queue report emails in memory and deliver them over a single SMTP session.
+
+    `enqueue`/`add_report` only build and store messages; `flush` opens one
+    authenticated SMTPSender session and sends the queued messages back-to-back,
+    so M reports cost one TCP + TLS + AUTH handshake instead of M.
+    """
+
+    def __init__(self, sender: str, receiver: str, password: str, **smtp_kwargs):
+        self.sender = sender
+        self.receiver = receiver
+        self.password = password
+        self.smtp_kwargs = smtp_kwargs
+        self.queue: list[EmailMessage] = []
+
+    @classmethod
+    def from_env(cls, **smtp_kwargs) -> "ReportSender":
+        """Create a ReportSender from the environment variables send_email_from_env uses."""
+        sender, receiver, password = _credentials_from_env()
+        return cls(sender, receiver, password, **smtp_kwargs)
+
+    def enqueue(self, msg: EmailMessage) -> None:
+        self.queue.append(msg)
+
+    def add_report(self, subject: str, body: str, table_path: Optional[Path] = None) -> None:
+        """Build a report message (reading `table_path` now) and queue it."""
+        self.enqueue(build_message(self.sender, self.receiver, subject, body, table_path))
+
+    def flush(self) -> int:
+        """Send every queued message over one session; returns the number sent.
+
+        Messages are removed from the queue as they are delivered, so after a
+        failure the queue holds exactly the messages that were not sent.
+        """
+        if not self.queue:
+            return 0
+        sent = 0
+        with SMTPSender(self.sender, self.password, **self.smtp_kwargs) as session:
+            while self.queue:
+                session.send(self.queue[0])
+                self.queue.pop(0)
+                sent += 1
+        return sent
 
 
 def _cli_main(argv: Optional[list[str]] = None) -> int:
@@ -5,7 +5,7 @@ Usage:
     - Ensure `main.py` credentials are set (via .env) so the email can be sent.
     - Run:
             py .\scan_and_send.py        # preview and generate table.csv
-            py .\scan_and_send.py --send # generate table.csv and send email (calls main.py --send)
+            py .\scan_and_send.py --send # generate table.csv and send email (uses main.py's sender)
 
 What it does:
     - Scans immediate child directories of the base folder (default './sftp').
@@ -13,38 +13,55 @@ What it does:
              <child>/completed  -> counted as processed
              <child>/errorFile  -> counted as error
     - Writes c:/Users/HP/alerting_mail/table.csv with columns: item,processed,error,total
-    - Optionally calls main.py --send to send the email (main.py will include the table.csv automatically)
+    - Optionally runs main.py's --send flow in-process to send the email (it includes table.csv automatically)
 """
 
 import os
 import csv
 import argparse
-import subprocess
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from main import _cli_main
+
 
 def count_files(folder: Path) -> int:
-    if not folder.exists() or not folder.is_dir():
+    # os.scandir reuses the d_type from readdir, so is_file() needs no extra stat() for regular
+    # files; symlinks are still followed, matching Path.is_file()
+    try:
+        with os.scandir(folder) as it:
+            # count only files (not directories)
+            return sum(1 for e in it if e.is_file())
+    except (FileNotFoundError, NotADirectoryError):
         return 0
-    # count only files (not directories)
-    return sum(1 for p in folder.iterdir() if p.is_file())
 
 
-def scan(base_path: Path):
+def _count_child(child: Path):
+    processed = count_files(child / 'completed')
+    error = count_files(child / 'errorFile')
+    total = processed + error
+    return (child.name, str(processed), str(error), str(total))
+
+
+def scan(base_path: Path, jobs: int = 32):
     rows = []
-    if not base_path.exists() or not base_path.is_dir():
+    try:
+        with os.scandir(base_path) as it:
+            children = sorted(e.name for e in it if e.is_dir())
+    except (FileNotFoundError, NotADirectoryError):
         print(f"Base folder not found: {base_path.resolve()}")
         return rows
 
-    for child in sorted(base_path.iterdir()):
-        if not child.is_dir():
-            continue
-        processed = count_files(child / 'completed')
-        error = count_files(child / 'errorFile')
-        total = processed + error
-        rows.append((child.name, str(processed), str(error), str(total)))
+    if not children:
+        return rows
+
+    # directory reads spend their time in the kernel/filesystem, so threads overlap well,
+    # especially on network mounts
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(children)))) as executor:
+        rows = list(executor.map(_count_child, (base_path / name for name in children)))
 
-    return rows
+    return sorted(rows)
 
 
 def write_table_csv(path: Path, rows):
@@ -59,11 +76,12 @@ def write_table_csv(path: Path, rows):
 def main():
     p = argparse.ArgumentParser(description='Scan sftp folders and generate table.csv, then optionally send email')
     p.add_argument('--base', default='sftp', help='Base folder to scan (default: sftp)')
-    p.add_argument('--send', action='store_true', help='Call main.py --send after generating table.csv')
+    p.add_argument('--send', action='store_true', help='Send the email through main.py after generating table.csv')
+    p.add_argument('--jobs', type=int, default=32, help='Number of child folders to scan in parallel (default: 32)')
     args = p.parse_args()
 
     base = Path(args.base)
-    rows = scan(base)
+    rows = scan(base, jobs=args.jobs)
     if not rows:
         print('No child folders found or base path missing. Expected structure: sftp/<name>/(completed|errorFile)')
         return
@@ -77,16 +95,11 @@ def main():
         print(f'{r[0]:<15} processed={r[1]:>3}  error={r[2]:>3}  total={r[3]:>3}')
 
     if args.send:
-        # call main.py to send the email
-        print('\nCalling main.py --send to deliver the email...')
-        # Use the py launcher on Windows; fallback to python if py fails
-        cmd = ['py', '.\\main.py', '--send']
-        try:
-            subprocess.check_call(cmd)
-        except FileNotFoundError:
-            cmd[0] = 'python'
-            subprocess.check_call(cmd)
+        # reuse main.py's CLI in-process instead of starting a second interpreter
+        print('\nSending the email via main.py...')
+        logging.basicConfig(level=logging.INFO)
+        return _cli_main(['--send'])
 
 
 if __name__ == '__main__':
-    main()
+    raise SystemExit(main())
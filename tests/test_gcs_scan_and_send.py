@@ -0,0 +1,105 @@
+import http.server
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import gcs_scan_and_send as gcs
+
+
+class _ListingHandler(http.server.BaseHTTPRequestHandler):
+    """Serves one JSON listing with a fixed ETag and answers matching If-None-Match with 304."""
+
+    protocol_version = "HTTP/1.1"
+    etag = '"v1"'
+    body = {"prefixes": ["sftp/item/"]}
+    requests: list = []
+
+    def do_GET(self):
+        inm = self.headers.get("If-None-Match")
+        type(self).requests.append(inm)
+        if inm == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data = json.dumps(self.body).encode()
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class ListingCacheTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _ListingHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _ListingHandler.requests = []
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_path = Path(tmp.name) / "gcs_listing.json"
+        self.cache = gcs._ListingCache(self.cache_path)
+        patcher = mock.patch.object(gcs, "_LISTING_CACHE", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/o?delimiter=%2F"
+
+    def get(self, cache_kind="prefixes"):
+        return gcs._http_get(self.url, cache_kind=cache_kind)
+
+    def test_fresh_entry_is_served_without_a_request(self):
+        self.assertEqual(self.get(), _ListingHandler.body)
+        self.assertEqual(self.get(), _ListingHandler.body)
+        self.assertEqual(_ListingHandler.requests, [None])
+
+    def test_expired_entry_is_revalidated_with_etag(self):
+        self.get()
+        key = self.cache.key(self.url)
+        self.cache._entries[key][2] = time.time() - 1
+
+        self.assertEqual(self.get(), _ListingHandler.body)
+        self.assertEqual(_ListingHandler.requests, [None, '"v1"'])
+        # the 304 extends the entry, so the next call is a fresh hit again
+        self.assertGreater(self.cache.get(key)[2], time.time())
+        self.get()
+        self.assertEqual(len(_ListingHandler.requests), 2)
+
+    def test_save_is_private_and_drops_long_expired_entries(self):
+        stale = time.time() - gcs.LISTING_CACHE_RETENTION - 1
+        self.cache_path.write_text(json.dumps({"old": [None, {}, stale], "other-run": [None, {}, time.time() + 60]}))
+        self.get()
+        self.cache.save()
+
+        saved = json.loads(self.cache_path.read_text())
+        self.assertEqual(set(saved), {self.cache.key(self.url), "other-run"})
+        self.assertEqual(stat.S_IMODE(os.stat(self.cache_path).st_mode), 0o600)
+        self.assertEqual([p.name for p in self.cache_path.parent.iterdir()], [self.cache_path.name])
+
+    def test_uncached_kind_always_requests(self):
+        self.get(cache_kind=None)
+        self.get(cache_kind=None)
+        self.assertEqual(_ListingHandler.requests, [None, None])
+        self.cache.save()
+        self.assertFalse(self.cache_path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
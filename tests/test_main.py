@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+
+
+class LoadDotenvTests(unittest.TestCase):
+    def _write_env(self, text: str) -> str:
+        fd, path = tempfile.mkstemp(suffix=".env")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_first_duplicate_key_wins(self):
+        path = self._write_env("DUP_KEY=first\nDUP_KEY=second\n")
+        with mock.patch.dict(os.environ, {}, clear=True):
+            main.load_dotenv(path)
+            self.assertEqual(os.environ["DUP_KEY"], "first")
+
+    def test_existing_environment_is_not_overwritten(self):
+        path = self._write_env("SET_KEY=from-file\n")
+        with mock.patch.dict(os.environ, {"SET_KEY": "from-env"}, clear=True):
+            main.load_dotenv(path)
+            self.assertEqual(os.environ["SET_KEY"], "from-env")
+
+    def test_quotes_comments_and_hashes(self):
+        path = self._write_env('# comment\nA="two words"\nB=\'x#y\'\nC=p#ss  \nnot a pair\n')
+        with mock.patch.dict(os.environ, {}, clear=True):
+            main.load_dotenv(path)
+            self.assertEqual((os.environ["A"], os.environ["B"], os.environ["C"]), ("two words", "x#y", "p#ss"))
+            self.assertNotIn("not a pair", os.environ)
+
+
+if __name__ == "__main__":
+    unittest.main()